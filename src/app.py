@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 from generate import PosterGenerator
+from ingest import ingest_image, proxy_covers, MAX_ZOOM
 from io import BytesIO
 
 # Set page layout
@@ -77,6 +78,23 @@ with st.sidebar.expander("Adjust Standard Texts"):
         font_sizes[key] = c1.number_input(f"Size: {label}", value=def_size, step=5, key=f"sz_{key}")
         spacings[key] = c2.number_input(f"Space: {label}", value=0, step=1, key=f"sp_{key}")
 
+# Fit-to-box: picks the largest size/tracking that fits instead of tuning by hand
+fits = {}
+# Header texts are centered on the full width; footer texts share the row with the QR code
+fit_max_widths = {'title_en': 1800, 'subtitle_en': 1800, 'title_jp': 1800, 'target_audience': 1800}
+
+with st.sidebar.expander("Auto-fit Standard Texts"):
+    for key, label, def_size in text_keys:
+        if not st.checkbox(f"Fit: {label}", value=False, key=f"fit_{key}"):
+            continue
+        c1, c2 = st.columns(2)
+        max_w = c1.number_input("Max W", value=fit_max_widths.get(key, 1300), step=10, key=f"fit_w_{key}")
+        max_h = c2.number_input("Max H (0 = none)", value=0, step=10, key=f"fit_h_{key}")
+        c3, c4 = st.columns(2)
+        min_sz = c3.number_input("Min Size", value=20, step=5, key=f"fit_min_{key}")
+        max_sz = c4.number_input("Max Size", value=def_size * 2, step=5, key=f"fit_max_{key}")
+        fits[key] = {'max_width': max_w, 'max_height': max_h, 'min_size': min_sz, 'max_size': max_sz}
+
 st.sidebar.header("3. Custom Texts")
 if 'custom_blocks' not in st.session_state:
     st.session_state.custom_blocks = []
@@ -102,6 +120,18 @@ for i, block in enumerate(st.session_state.custom_blocks):
         block['spacing'] = c4.number_input("Spacing", value=block['spacing'], step=1, key=f"ct_sp_{i}")
         
         block['color'] = st.color_picker("Color", block['color'], key=f"ct_col_{i}")
+
+        if st.checkbox("Fit to Box", value='fit' in block, key=f"ct_fit_{i}"):
+            fit = block.get('fit', {'max_width': 800, 'max_height': 0, 'min_size': 20, 'max_size': 200})
+            c5, c6 = st.columns(2)
+            fit['max_width'] = c5.number_input("Max W", value=fit['max_width'], step=10, key=f"ct_fit_w_{i}")
+            fit['max_height'] = c6.number_input("Max H (0 = none)", value=fit['max_height'], step=10, key=f"ct_fit_h_{i}")
+            c7, c8 = st.columns(2)
+            fit['min_size'] = c7.number_input("Min Size", value=fit['min_size'], step=5, key=f"ct_fit_min_{i}")
+            fit['max_size'] = c8.number_input("Max Size", value=fit['max_size'], step=5, key=f"ct_fit_max_{i}")
+            block['fit'] = fit
+        else:
+            block.pop('fit', None)
         
         # Button to remove? 
         # Streamlit state management for removal is tricky in a loop. 
@@ -109,6 +139,39 @@ for i, block in enumerate(st.session_state.custom_blocks):
         
     custom_texts_config.append(block)
 
+# --- Upload Ingestion ---
+# Uploads are validated, EXIF-oriented, mode-converted and downscaled for their slot once;
+# reruns reuse the stored proxy instead of decoding the original again.
+# The original bytes are kept so the proxy can be rebuilt if the slot is enlarged.
+if 'ingested' not in st.session_state:
+    st.session_state.ingested = {}
+
+def ingest_upload(widget_key, uploaded_file, slot_size):
+    if not uploaded_file:
+        st.session_state.ingested.pop(widget_key, None)
+        return None
+    source_id = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, 'file_id', None))
+    cached = st.session_state.ingested.get(widget_key)
+    if cached and cached['source_id'] == source_id:
+        if 'error' in cached:
+            # Rejected before; keep the message visible without decoding again
+            st.error(cached['error'])
+            return None
+        if proxy_covers(cached['proxy'], slot_size):
+            return cached['proxy']
+        data = cached['data'] # Slot grew: rebuild from the original
+    else:
+        data = uploaded_file.getvalue()
+    try:
+        proxy = ingest_image(data, slot_size)
+    except ValueError as e:
+        error = f"{uploaded_file.name}: {e}"
+        st.session_state.ingested[widget_key] = {'source_id': source_id, 'error': error}
+        st.error(error)
+        return None
+    st.session_state.ingested[widget_key] = {'source_id': source_id, 'data': data, 'proxy': proxy}
+    return proxy
+
 st.sidebar.header("4. Custom Images")
 if 'custom_image_blocks' not in st.session_state:
     st.session_state.custom_image_blocks = []
@@ -125,8 +188,6 @@ custom_images_config = []
 for i, block in enumerate(st.session_state.custom_image_blocks):
     with st.sidebar.expander(f"Image Block {i+1}", expanded=True):
         f = st.file_uploader("Upload", type=['png', 'jpg', 'jpeg'], key=f"ci_file_{i}")
-        if f:
-             block['image'] = f
         
         c1, c2 = st.columns(2)
         block['x'] = c1.number_input("X", value=block['x'], step=10, key=f"ci_x_{i}")
@@ -136,10 +197,16 @@ for i, block in enumerate(st.session_state.custom_image_blocks):
         block['w'] = c3.number_input("Width", value=block['w'], step=10, key=f"ci_w_{i}")
         block['h'] = c4.number_input("Height", value=block['h'], step=10, key=f"ci_h_{i}")
         
-        block['scale'] = st.slider("Scale", 0.1, 3.0, block['scale'], 0.1, key=f"ci_s_{i}")
+        block['scale'] = st.slider("Scale", 0.1, MAX_ZOOM, block['scale'], 0.1, key=f"ci_s_{i}")
+        
+        proxy = ingest_upload(f"ci_file_{i}", f, (block['w'], block['h']))
+        if proxy:
+             block['image'] = proxy
+        else:
+             block.pop('image', None)
         
         # Only add to config if image is present (or we handle missing safely)
-        if f:
+        if proxy:
             custom_images_config.append(block)
 
 st.sidebar.header("5. QR Code")
@@ -175,15 +242,13 @@ for i, slot in enumerate(slots):
     with c.expander(f"Slot: {slot}", expanded=i==0):
         # File Uploader
         uploaded_file = st.file_uploader(f"Upload Image for {slot}", type=['png', 'jpg', 'jpeg'], key=f"file_{slot}")
-        if uploaded_file:
-            images[slot] = uploaded_file
         
         # Layout Inputs
         st.caption("Fine-tune Position & Size")
         def_v = defaults.get(slot, {'x':0, 'y':0, 'w':100, 'h':100})
         
         # Scale slider
-        scale = st.slider(f"Scale (Zoom) {slot}", 0.1, 3.0, 1.0, 0.1, key=f"s_{slot}")
+        scale = st.slider(f"Scale (Zoom) {slot}", 0.1, MAX_ZOOM, 1.0, 0.1, key=f"s_{slot}")
 
         l_c1, l_c2, l_c3, l_c4 = st.columns(4)
         x = l_c1.number_input(f"X", value=def_v['x'], step=10, key=f"x_{slot}")
@@ -193,6 +258,11 @@ for i, slot in enumerate(slots):
         
         layout_overrides[slot] = {"x": int(x), "y": int(y), "w": int(w), "h": int(h), "scale": scale}
 
+        # Ingest after the size inputs so the proxy is sized for this slot
+        proxy = ingest_upload(f"file_{slot}", uploaded_file, (int(w), int(h)))
+        if proxy:
+            images[slot] = proxy
+
 # --- Generation Logic ---
 
 @st.cache_resource
@@ -219,6 +289,7 @@ config = {
     "layout": layout_overrides,
     "font_sizes": font_sizes,
     "spacings": spacings,
+    "fits": fits,
     "custom_texts": custom_texts_config,
     "custom_images": custom_images_config,
     "qr_url": qr_url,
@@ -0,0 +1,173 @@
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory
+from io import BytesIO
+from PIL import Image
+import hashlib
+import os
+from ingest import ImageProxy
+
+# Picklable reference to a decoded RGBA image held in shared memory.
+# Put these in a config instead of paths/uploads and send the config to worker processes.
+AssetHandle = namedtuple('AssetHandle', ['digest', 'name', 'width', 'height'])
+
+# Per-process cache of attached segments: name -> SharedMemory
+_attached = {}
+
+def _read_bytes(image_input):
+    """Reads raw bytes from a file path or a file-like object (e.g. BytesIO, UploadedFile)."""
+    if isinstance(image_input, str):
+        with open(image_input, 'rb') as f:
+            return f.read()
+    image_input.seek(0)
+    return image_input.read()
+
+def _attach(name):
+    shm = _attached.get(name)
+    if shm is None:
+        try:
+            # Python 3.13+: don't let this process' resource tracker unlink the owner's segment
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm
+
+def open_asset(handle):
+    """Returns a zero-copy, read-only RGBA view of a shared asset. Works in any process."""
+    shm = _attach(handle.name)
+    size = handle.width * handle.height * 4
+    return Image.frombuffer('RGBA', (handle.width, handle.height), shm.buf[:size], 'raw', 'RGBA', 0, 1)
+
+def detach_all():
+    """Closes this process' attachments. Call when a worker is done rendering."""
+    for name, shm in list(_attached.items()):
+        try:
+            shm.close()
+        except BufferError:
+            continue # An image view is still alive; keep the mapping
+        del _attached[name]
+
+class SharedAssetStore:
+    """Decodes each unique source image once (keyed by content hash) into shared memory.
+
+    Owned by the parent process. `put` returns a handle and takes a reference; `release`
+    drops it. Unreferenced assets stay cached until the store exceeds `capacity_bytes`,
+    then the least recently used ones are unlinked. Only referenced assets can keep
+    the store over capacity.
+    """
+    def __init__(self, capacity_bytes=512 * 1024 * 1024):
+        self.capacity_bytes = capacity_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict() # digest -> [handle, SharedMemory, refcount]
+
+    def put(self, image_input):
+        """Returns an AssetHandle for the image, decoding it only if its content is new.
+        Returns None for a missing or undecodable file, like _process_image.
+        """
+        if isinstance(image_input, str) and not os.path.exists(image_input):
+            return None
+        if isinstance(image_input, AssetHandle):
+            self.acquire(image_input)
+            return image_input
+
+        if isinstance(image_input, ImageProxy):
+            # The proxy's pixels differ from the original file's (oriented, downscaled),
+            # so key it apart from the raw bytes with the same digest
+            key = f"{image_input.digest}:{image_input.width}x{image_input.height}:{image_input.image.mode}"
+            digest = hashlib.sha256(key.encode()).hexdigest()
+        else:
+            data = _read_bytes(image_input)
+            digest = hashlib.sha256(data).hexdigest()
+        entry = self._entries.get(digest)
+        if entry:
+            entry[2] += 1
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+        try:
+            if isinstance(image_input, ImageProxy):
+                img = image_input.image.convert("RGBA")
+            else:
+                img = Image.open(BytesIO(data)).convert("RGBA")
+        except Exception as e:
+            print(f"Error decoding image {image_input}: {e}")
+            return None
+        raw = img.tobytes()
+        # Let the OS pick a short unique name (macOS caps shm names at 31 chars)
+        shm = shared_memory.SharedMemory(create=True, size=len(raw))
+        shm.buf[:len(raw)] = raw
+        handle = AssetHandle(digest, shm.name, img.width, img.height)
+
+        self._entries[digest] = [handle, shm, 1]
+        self.total_bytes += len(raw)
+        self._evict()
+        return handle
+
+    def acquire(self, handle):
+        entry = self._entries.get(handle.digest)
+        if entry is None:
+            raise ValueError(f"Asset {handle.digest[:12]} is no longer in the store (evicted or closed); put the original image again")
+        entry[2] += 1
+        self._entries.move_to_end(handle.digest)
+
+    def release(self, handle):
+        entry = self._entries.get(handle.digest)
+        if entry and entry[2] > 0:
+            entry[2] -= 1
+        self._evict()
+
+    def share_config(self, config):
+        """Returns a copy of a poster config whose images are replaced by shared handles."""
+        shared = dict(config)
+        shared['images'] = {}
+        for key, image_input in config.get('images', {}).items():
+            handle = self.put(image_input) if image_input else None
+            if handle:
+                shared['images'][key] = handle
+        shared['custom_images'] = []
+        for c in config.get('custom_images', []):
+            handle = self.put(c['image']) if c.get('image') else None
+            if handle:
+                shared['custom_images'].append(dict(c, image=handle))
+        return shared
+
+    def release_config(self, shared_config):
+        for handle in shared_config.get('images', {}).values():
+            self.release(handle)
+        for c in shared_config.get('custom_images', []):
+            self.release(c['image'])
+
+    def _evict(self):
+        # Oldest first; referenced entries are skipped
+        for digest in list(self._entries):
+            if self.total_bytes <= self.capacity_bytes:
+                break
+            handle, shm, refs = self._entries[digest]
+            if refs > 0:
+                continue
+            self._unlink(shm)
+            self.total_bytes -= handle.width * handle.height * 4
+            del self._entries[digest]
+
+    def _unlink(self, shm):
+        for segment in (_attached.pop(shm.name, None), shm):
+            if segment is None:
+                continue
+            try:
+                segment.close()
+            except BufferError:
+                pass # Views in this process keep the mapping alive; the name is still removed
+        shm.unlink()
+
+    def close(self):
+        """Unlinks every segment. Workers that are still attached keep their mappings."""
+        for handle, shm, _ in self._entries.values():
+            self._unlink(shm)
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
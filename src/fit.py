@@ -0,0 +1,79 @@
+from functools import lru_cache
+from PIL import ImageFont
+
+# Advances are measured once at this size and scaled linearly to any candidate size,
+# so the search never has to load or rasterize the font at the sizes it tries.
+# Only the winning size is loaded, to correct for Pillow's per-size rounding.
+REFERENCE_SIZE = 1000
+
+@lru_cache(maxsize=16)
+def _reference_font(font_path):
+    return ImageFont.truetype(font_path, REFERENCE_SIZE)
+
+@lru_cache(maxsize=8192)
+def _advance(font_path, char):
+    """Advance width of a single character at REFERENCE_SIZE."""
+    return _reference_font(font_path).getlength(char)
+
+@lru_cache(maxsize=16)
+def _line_height(font_path):
+    ascent, descent = _reference_font(font_path).getmetrics()
+    return ascent + descent
+
+@lru_cache(maxsize=64)
+def _sized_font(font_path, size):
+    return ImageFont.truetype(font_path, size)
+
+def _real_extent(font_path, text, size):
+    """(width without tracking, line height) as draw_text_spaced lays the text out at `size`."""
+    font = _sized_font(font_path, size)
+    ascent, descent = font.getmetrics()
+    return sum(font.getlength(char) for char in text), ascent + descent
+
+@lru_cache(maxsize=1024)
+def fit_text(font_path, text, spacing=0, max_width=None, max_height=None, min_size=10, max_size=300):
+    """Returns (size, spacing) for `text` (drawn with draw_text_spaced) inside max_width x max_height.
+
+    Size takes priority over tracking: picks the largest size in [min_size, max_size] that fits
+    with tracking reduced as far as 0 (or the configured value, if negative), then the largest
+    tracking <= the configured value that fits at that size. Returns min_size if nothing fits.
+    """
+    min_size = int(min_size)
+    max_size = max(int(max_size), min_size)
+    if not text:
+        return max_size, spacing
+
+    gaps = len(text) - 1
+    min_spacing = min(spacing, 0)
+    width_per_px = sum(_advance(font_path, char) for char in text) / REFERENCE_SIZE
+    height_per_px = _line_height(font_path) / REFERENCE_SIZE
+
+    def fits(width, height, tracking):
+        if max_width and width + tracking * gaps > max_width:
+            return False
+        if max_height and height > max_height:
+            return False
+        return True
+
+    # Binary search on the scaled reference metrics (each check is O(1))
+    lo, hi = min_size, max_size
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid * width_per_px, mid * height_per_px, min_spacing):
+            lo = mid
+        else:
+            hi = mid - 1
+
+    # Pillow rounds advances at the real size, so confirm with the real font and step down
+    width, height = _real_extent(font_path, text, lo)
+    while lo > min_size and not fits(width, height, min_spacing):
+        lo -= 1
+        width, height = _real_extent(font_path, text, lo)
+
+    if fits(width, height, spacing):
+        return lo, spacing
+    if max_width and gaps:
+        spacing = max(min_spacing, min(spacing, int((max_width - width) // gaps)))
+    else:
+        spacing = min_spacing
+    return lo, spacing
@@ -2,6 +2,9 @@ from PIL import Image, ImageDraw, ImageFont, ImageOps
 import qrcode
 import os
 import platform
+from fit import fit_text
+from assets import AssetHandle, open_asset
+from ingest import ImageProxy
 
 class PosterGenerator:
     def __init__(self, output_path, config):
@@ -18,6 +21,8 @@ class PosterGenerator:
         self.poster = Image.new('RGB', (self.width, self.height), self.bg_color)
         self.draw = ImageDraw.Draw(self.poster)
         self.fonts = {}
+        self.font_path = None
+        self._sized_fonts = {} # (font_path, size) -> font, for auto-fitted texts
         self._load_fonts()
 
     def _load_fonts(self):
@@ -57,6 +62,7 @@ class PosterGenerator:
             elif system == "Windows":
                 font_path = "msgothic.ttc"
         
+        self.font_path = font_path
         try:
             for key, default_size in defaults.items():
                 size = font_config.get(key, default_size)
@@ -175,30 +181,63 @@ class PosterGenerator:
             self.draw.text((current_x, draw_y), char, font=font, fill=fill, anchor='la') # always draw from top-left of char
             current_x += char_widths[i] + spacing
 
-    def draw_text(self):
-        texts = self.config.get('texts', {})
-        spacings = self.config.get('spacings', {}) # Dict of spacings
-        
-        # Helper to get spacing with default 0
-        def get_spacing(key):
-            return spacings.get(key, 0)
+    def _get_font(self, font_path, size):
+        key = (font_path, size)
+        if key not in self._sized_fonts:
+            self._sized_fonts[key] = ImageFont.truetype(font_path, size)
+        return self._sized_fonts[key]
 
-        # --- Header ---
-        self.draw_text_spaced((self.width/2, 150), texts.get('title_en', ''), self.fonts['title_en'], self.text_black, "mm", get_spacing('title_en'))
-        self.draw_text_spaced((self.width/2, 250), texts.get('subtitle_en', ''), self.fonts['subtitle_en'], self.text_black, "mm", get_spacing('subtitle_en'))
-        
-        self.draw_text_spaced((self.width/2, 450), texts.get('title_jp', ''), self.fonts['title_jp'], self.text_orange, "mm", get_spacing('title_jp'))
-        self.draw_text_spaced((self.width/2, 600), texts.get('target_audience', ''), self.fonts['target'], self.text_black, "mm", get_spacing('target_audience'))
+    def _fit_font(self, text, font, spacing, fit, font_path):
+        """Returns (font, spacing) shrunk/grown to fit the box described by `fit`.
+        fit = {max_width, max_height, min_size, max_size}; falls back to the given font on failure.
+        """
+        if not fit or not text or not font_path:
+            return font, spacing
+        try:
+            size, spacing = fit_text(
+                font_path, text, spacing,
+                fit.get('max_width'), fit.get('max_height'),
+                fit.get('min_size', 10), fit.get('max_size', 300)
+            )
+            return self._get_font(font_path, size), spacing
+        except Exception as e:
+            print(f"Auto-fit failed for '{text}': {e}")
+            return font, spacing
 
-        # --- Footer ---
+    def text_blocks(self):
+        """Placement of the standard texts: text_key -> (xy, font_key, fill, anchor)."""
         footer_start_x = 100
         footer_y = 2150
+        return {
+            # --- Header ---
+            'title_en': ((self.width/2, 150), 'title_en', self.text_black, "mm"),
+            'subtitle_en': ((self.width/2, 250), 'subtitle_en', self.text_black, "mm"),
+            'title_jp': ((self.width/2, 450), 'title_jp', self.text_orange, "mm"),
+            'target_audience': ((self.width/2, 600), 'target', self.text_black, "mm"),
+            # --- Footer ---
+            'date': ((footer_start_x, footer_y), 'date', self.text_white, "la"),
+            'welcome_msg': ((footer_start_x, footer_y + 220), 'info_mid', self.text_white, "la"),
+            'location_line1': ((footer_start_x, footer_y + 320), 'info_large', self.text_white, "la"),
+            'location_line2': ((footer_start_x, footer_y + 430), 'info_large', self.text_white, "la"),
+            'contact': ((footer_start_x, footer_y + 550), 'contact', self.text_white, "la"),
+        }
+
+    def draw_text_block(self, text_key, text):
+        """Draws one standard text at its usual place, applying spacing and auto-fit settings."""
+        xy, font_key, fill, anchor = self.text_blocks()[text_key]
+        spacing = self.config.get('spacings', {}).get(text_key, 0)
+        # Dict of fit-to-box settings by text key. Like font_sizes, an entry under a font key
+        # (e.g. 'info_large') applies to every text using that font (both location lines).
+        fits = self.config.get('fits', {})
+        fit = fits.get(text_key) or fits.get(font_key)
+        font, spacing = self._fit_font(text, self.fonts[font_key], spacing, fit, self.font_path)
+        self.draw_text_spaced(xy, text, font, fill, anchor, spacing)
+
+    def draw_text(self):
+        texts = self.config.get('texts', {})
         
-        self.draw_text_spaced((footer_start_x, footer_y), texts.get('date', ''), self.fonts['date'], self.text_white, "la", get_spacing('date'))
-        self.draw_text_spaced((footer_start_x, footer_y + 220), texts.get('welcome_msg', ''), self.fonts['info_mid'], self.text_white, "la", get_spacing('welcome_msg'))
-        self.draw_text_spaced((footer_start_x, footer_y + 320), texts.get('location_line1', ''), self.fonts['info_large'], self.text_white, "la", get_spacing('location_line1'))
-        self.draw_text_spaced((footer_start_x, footer_y + 430), texts.get('location_line2', ''), self.fonts['info_large'], self.text_white, "la", get_spacing('location_line2'))
-        self.draw_text_spaced((footer_start_x, footer_y + 550), texts.get('contact', ''), self.fonts['contact'], self.text_white, "la", get_spacing('contact'))
+        for text_key in self.text_blocks():
+            self.draw_text_block(text_key, texts.get(text_key, ''))
         
         # --- Custom Texts ---
         custom_texts = self.config.get('custom_texts', [])
@@ -221,7 +260,8 @@ class PosterGenerator:
                 if system == "Darwin" and os.path.exists("/System/Library/Fonts/Hiragino Sans GB.ttc"):
                      font_path = "/System/Library/Fonts/Hiragino Sans GB.ttc"
                 
-                font = ImageFont.truetype(font_path, size)
+                font = self._get_font(font_path, size)
+                font, spacing = self._fit_font(c['text'], font, c.get('spacing', 0), c.get('fit'), font_path)
                 
                 # Draw
                 color = c.get('color', (0,0,0))
@@ -234,7 +274,7 @@ class PosterGenerator:
                     font, 
                     color, 
                     "la", # Default to Left-Top align for custom texts
-                    c.get('spacing', 0)
+                    spacing
                 )
             except Exception as e:
                 print(f"Failed to draw custom text: {e}")
@@ -250,7 +290,14 @@ class PosterGenerator:
                 if not os.path.exists(image_input):
                     return None
             
-            img = Image.open(image_input).convert("RGBA")
+            if isinstance(image_input, ImageProxy):
+                # Already oriented, mode-converted and downscaled at upload (RGB or RGBA)
+                img = image_input.image
+            elif isinstance(image_input, AssetHandle):
+                # Already decoded once by SharedAssetStore; zero-copy view (never mutated below)
+                img = open_asset(image_input)
+            else:
+                img = Image.open(image_input).convert("RGBA")
             
             # 1. Base Fit: Resize to fully cover target_size (LANCZOS)
             # ImageOps.fit crops to exact aspect ratio of target_size
@@ -302,7 +349,9 @@ class PosterGenerator:
             print(f"Error processing image {image_input}: {e}")
             return None
 
-    def embed_images(self):
+    def placed_images(self):
+        """Returns [(RGBA image, (x, y)), ...] in paste order (corners, oval on top, custom images)."""
+        placed = []
         images = self.config.get('images', {})
         user_layout = self.config.get('layout', {})
         
@@ -330,7 +379,7 @@ class PosterGenerator:
                 scale = l.get('scale', 1.0)
                 img = self._process_image(images[key], (l['w'], l['h']), scale=scale)
                 if img:
-                    self.poster.paste(img, (l['x'], l['y']), img)
+                    placed.append((img, (l['x'], l['y'])))
 
         # 2. Center Oval (Top Layer)
         if 'center_oval' in images:
@@ -338,7 +387,7 @@ class PosterGenerator:
             scale = l.get('scale', 1.0)
             oval_img = self._process_image(images['center_oval'], (l['w'], l['h']), is_oval=True, scale=scale)
             if oval_img:
-                self.poster.paste(oval_img, (l['x'], l['y']), oval_img)
+                placed.append((oval_img, (l['x'], l['y'])))
                 
         # 3. Custom Images
         custom_images = self.config.get('custom_images', [])
@@ -358,7 +407,12 @@ class PosterGenerator:
             p_img = self._process_image(img_input, (w, h), is_oval=False, scale=scale)
             
             if p_img:
-                self.poster.paste(p_img, (x, y), p_img)
+                placed.append((p_img, (x, y)))
+        return placed
+
+    def embed_images(self):
+        for img, xy in self.placed_images():
+            self.poster.paste(img, xy, img)
 
     def get_qr_image(self):
         """Generates the QR code image."""
@@ -371,25 +425,36 @@ class PosterGenerator:
         qr.make(fit=True)
         return qr.make_image(fill_color="black", back_color="white").convert("RGB")
 
+    def qr_box(self):
+        """Returns (x, y, size) of the QR code area."""
+        qr_size = 400
+        return self.width - qr_size - 100, 2200, qr_size
+
+    def draw_qr_label(self):
+        label = "↑申し込みフォーム"
+        x_pos, y_pos, qr_size = self.qr_box()
+        self.draw.text((x_pos + qr_size/2, y_pos + qr_size + 20), label, fill=self.text_white, font=self.fonts['contact'], anchor="mt")
+
     def embed_qr(self):
         qr_img = self.get_qr_image()
         if qr_img:
-            label = "↑申し込みフォーム"
-            qr_size = 400
+            x_pos, y_pos, qr_size = self.qr_box()
             qr_img = qr_img.resize((qr_size, qr_size))
             
-            x_pos = self.width - qr_size - 100
-            y_pos = 2200
-            
             self.poster.paste(qr_img, (x_pos, y_pos))
-            self.draw.text((x_pos + qr_size/2, y_pos + qr_size + 20), label, fill=self.text_white, font=self.fonts['contact'], anchor="mt")
+            self.draw_qr_label()
 
-    def generate(self):
-        print("Starting poster generation...")
+    def render(self):
+        """Draws every layer onto self.poster and returns it."""
         self.draw_layout()
         self.draw_text()
         self.embed_images()
         self.embed_qr()
+        return self.poster
+
+    def generate(self):
+        print("Starting poster generation...")
+        self.render()
         
         try:
             self.poster.save(self.output_path)
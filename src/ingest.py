@@ -0,0 +1,71 @@
+from collections import namedtuple
+from io import BytesIO
+from PIL import Image, ImageOps
+import hashlib
+import math
+
+# Decoded, oriented and downscaled stand-in for an uploaded file.
+# `digest` is the SHA-256 of the original bytes; width/height are the proxy's dimensions and
+# source_size the oriented original's (equal when the proxy is at full resolution).
+ImageProxy = namedtuple('ImageProxy', ['digest', 'width', 'height', 'image', 'source_size'])
+
+ALLOWED_FORMATS = ('PNG', 'JPEG')
+# Upper bound of the Scale slider in app.py
+MAX_ZOOM = 3.0
+
+def _normalize_mode(img):
+    """RGBA if any pixel is actually transparent, else RGB (e.g. opaque screenshots/logos)."""
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        img = img.convert('RGBA')
+        if img.getchannel('A').getextrema()[0] < 255:
+            return img
+    return img.convert('RGB')
+
+def ingest_image(source, slot_size=None):
+    """Validates and normalizes an image once, so later renders skip decoding entirely.
+
+    - EXIF orientation is applied
+    - Mode becomes RGBA only if the image actually has transparency, else RGB
+    - Downscaled to the largest size _process_image could use for a slot of `slot_size` (w, h):
+      covering it at MAX_ZOOM. Re-ingest if the slot grows; see proxy_covers().
+
+    `source` is a file path, raw bytes or a file-like object.
+
+    Raises ValueError if the file is not a readable PNG/JPEG.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            data = f.read()
+    elif isinstance(source, bytes):
+        data = source
+    else:
+        source.seek(0)
+        data = source.read()
+
+    try:
+        img = Image.open(BytesIO(data))
+        if img.format not in ALLOWED_FORMATS:
+            raise ValueError(f"unsupported format {img.format}")
+        img.load()
+    except Exception as e:
+        raise ValueError(f"Invalid image: {e}") from e
+
+    img = ImageOps.exif_transpose(img)
+    img = _normalize_mode(img)
+
+    source_size = img.size
+    if slot_size:
+        # Cover-fit scale for the slot, times maximum zoom
+        needed = MAX_ZOOM * max(slot_size[0] / img.width, slot_size[1] / img.height)
+        if needed < 1.0:
+            size = (math.ceil(img.width * needed), math.ceil(img.height * needed))
+            img = img.resize(size, Image.Resampling.LANCZOS)
+
+    return ImageProxy(hashlib.sha256(data).hexdigest(), img.width, img.height, img, source_size)
+
+def proxy_covers(proxy, slot_size):
+    """True if `proxy` has enough pixels for a slot of `slot_size` at MAX_ZOOM
+    (always true at full resolution, since re-ingesting couldn't add detail)."""
+    if (proxy.width, proxy.height) == tuple(proxy.source_size):
+        return True
+    return MAX_ZOOM * max(slot_size[0] / proxy.width, slot_size[1] / proxy.height) <= 1.0 + 1e-9
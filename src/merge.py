@@ -0,0 +1,197 @@
+from PIL import Image, ImageDraw
+from io import BytesIO
+import numpy as np
+import qrcode
+import argparse
+import csv
+import json
+import os
+from generate import PosterGenerator
+
+def rasterize_qr(data, size):
+    """Renders a QR code for `data` as a size x size 'L' image straight from the module matrix.
+
+    Nearest-neighbour index mapping gives the same crisp result as make_image() + resize(),
+    without going through the PIL image factory.
+    """
+    qr = qrcode.QRCode(border=2)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = np.array(qr.get_matrix(), dtype=bool)
+    idx = np.arange(size) * len(matrix) // size
+    pixels = np.where(matrix[idx][:, idx], 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, 'L')
+
+class PdfPageWriter:
+    """Minimal streaming PDF writer: one JPEG-compressed image per page.
+
+    Each page is written to the file as soon as it is added, and only object offsets are kept,
+    so memory stays bounded and the cost per page is constant. The page tree and the xref table
+    are written by close().
+    """
+    PAGES_ID = 2
+
+    def __init__(self, path, dpi=240, quality=90):
+        self.file = open(path, 'wb')
+        self.dpi = dpi
+        self.quality = quality
+        self.offsets = {} # object id -> byte offset
+        self.page_ids = []
+        self.next_id = 3 # 1: catalog, 2: page tree
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n".encode())
+        self.file.write(body.encode())
+        if stream is not None:
+            self.file.write(b"\nstream\n")
+            self.file.write(stream)
+            self.file.write(b"\nendstream")
+        self.file.write(b"\nendobj\n")
+
+    def add_page(self, img):
+        buf = BytesIO()
+        img.convert('RGB').save(buf, format='JPEG', quality=self.quality)
+        jpeg = buf.getvalue()
+        # Page size in points (1/72 inch)
+        w_pt = img.width * 72 / self.dpi
+        h_pt = img.height * 72 / self.dpi
+        content = f"q {w_pt:.2f} 0 0 {h_pt:.2f} 0 0 cm /Im0 Do Q".encode()
+
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>"
+        ), jpeg)
+        self._write_object(content_id, f"<< /Length {len(content)} >>", content)
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {w_pt:.2f} {h_pt:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{i} 0 R" for i in self.page_ids)
+        self._write_object(1, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>")
+        self._write_object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_id}\n".encode())
+        self.file.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, self.next_id):
+            self.file.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.file.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class MailMerge:
+    """Renders personalized variants of one poster.
+
+    Everything except the QR code and the per-record `fields` (standard text keys, e.g. 'contact')
+    is rendered once into two cached layers: the background with static texts, and an RGBA layer
+    with the images. Each record copies the first layer, draws its texts, composites the image
+    layer on top and stamps its QR code, so layering matches PosterGenerator.render().
+    """
+    def __init__(self, config, fields=()):
+        plate_config = dict(config)
+        plate_config['qr_url'] = None
+        plate_config['texts'] = {k: v for k, v in config.get('texts', {}).items() if k not in fields}
+
+        # Fonts, images and static texts are loaded/drawn once here
+        gen = PosterGenerator(None, plate_config)
+        self.generator = gen
+        # Other keys (e.g. a name only used in the output file pattern) are not drawn
+        self.fields = [f for f in fields if f in gen.text_blocks()]
+
+        gen.draw_layout()
+        gen.draw_text()
+        self.plate = gen.poster
+
+        self.image_layer = Image.new('RGBA', (gen.width, gen.height), (0, 0, 0, 0))
+        for img, (x, y) in gen.placed_images():
+            if -x >= img.width or -y >= img.height:
+                continue # Entirely off-canvas
+            # alpha_composite doesn't accept negative offsets; crop the source instead
+            self.image_layer.alpha_composite(img, dest=(max(x, 0), max(y, 0)), source=(max(-x, 0), max(-y, 0)))
+
+    def render(self, record):
+        gen = self.generator
+        gen.poster = self.plate.copy()
+        gen.draw = ImageDraw.Draw(gen.poster)
+
+        for key in self.fields:
+            gen.draw_text_block(key, record.get(key, ''))
+
+        gen.poster = Image.alpha_composite(gen.poster.convert('RGBA'), self.image_layer).convert('RGB')
+        gen.draw = ImageDraw.Draw(gen.poster)
+
+        qr_data = record.get('qr_url')
+        if qr_data:
+            x_pos, y_pos, qr_size = gen.qr_box()
+            gen.poster.paste(rasterize_qr(qr_data, qr_size), (x_pos, y_pos))
+            gen.draw_qr_label()
+        return gen.poster
+
+    def render_all(self, records):
+        for record in records:
+            yield self.render(record)
+
+    def save_files(self, records, pattern, compress_level=1, quality=90):
+        """Saves one file per record. `pattern` is formatted with `index` and the record's fields,
+        e.g. "out/poster_{index:04d}.png". The extension picks the format; PNG uses a fast zlib
+        level by default, and .jpg is faster still for bulk output.
+        """
+        count = 0
+        for i, record in enumerate(records):
+            path = pattern.format(**dict(record, index=i))
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.render(record).save(path, compress_level=compress_level, quality=quality)
+            count += 1
+        return count
+
+    def save_pdf(self, records, path, dpi=240, quality=90):
+        """Streams all variants into one multi-page PDF in a single pass, one JPEG page per record.
+        Only the current variant is held in memory. 2000x2828 px at 240 dpi is roughly A4.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with PdfPageWriter(path, dpi=dpi, quality=quality) as pdf:
+            for record in records:
+                pdf.add_page(self.render(record))
+        return len(pdf.page_ids)
+
+def load_records(csv_path):
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+def main():
+    parser = argparse.ArgumentParser(description="Render personalized QR posters from a shared base plate.")
+    parser.add_argument("config", help="Poster config (JSON, same keys as PosterGenerator config)")
+    parser.add_argument("records", help="CSV with a 'qr_url' column and optional standard text columns (e.g. 'contact')")
+    parser.add_argument("-o", "--output", default="merged/poster_{index:04d}.png",
+                        help="Output .pdf, or a file name pattern formatted with {index} and CSV columns")
+    parser.add_argument("--dpi", type=int, default=240, help="PDF resolution")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality for PDF pages and .jpg output")
+    parser.add_argument("--compress-level", type=int, default=1, help="PNG zlib level (0-9, higher is smaller but slower)")
+    args = parser.parse_args()
+
+    with open(args.config, encoding='utf-8') as f:
+        config = json.load(f)
+    records = load_records(args.records)
+    fields = list(records[0].keys()) if records else []
+
+    merge = MailMerge(config, fields)
+    if args.output.lower().endswith('.pdf'):
+        count = merge.save_pdf(records, args.output, dpi=args.dpi, quality=args.quality)
+    else:
+        count = merge.save_files(records, args.output, compress_level=args.compress_level, quality=args.quality)
+    print(f"Success! {count} posters saved to {args.output}")
+
+if __name__ == "__main__":
+    main()